@@ -1,515 +1,903 @@
 #!/usr/bin/env python3
 """
 Simple API server to provide Docker container statistics for the dashboard.
-This runs as a lightweight HTTP server that the status.html page can call.
+This runs as a lightweight aiohttp server that the status.html page can call.
+
+Docker is queried through its Engine API on the mounted unix socket rather than
+by shelling out to the `docker` CLI, so no request pays for a fork/exec or has
+to parse CLI text output.
 """
 
+import asyncio
+import codecs
+import contextlib
+import hashlib
 import json
-import subprocess
+import os
+import re
+import struct
 import time
-from http.server import HTTPServer, BaseHTTPRequestHandler
-from urllib.parse import urlparse
-import threading
-
-
-class DockerStatsHandler(BaseHTTPRequestHandler):
-    def do_GET(self):
-        """Handle GET requests for container stats."""
-        parsed_path = urlparse(self.path)
-        
-        if parsed_path.path == '/api/container-stats':
-            self.handle_container_stats()
-        elif parsed_path.path == '/api/system-info':
-            self.handle_system_info()
-        elif parsed_path.path == '/health':
-            self.handle_health()
-        elif parsed_path.path.startswith('/api/container/') and parsed_path.path.endswith('/logs'):
-            self.handle_container_logs(parsed_path.path)
-        else:
-            self.send_error(404, "Not Found")
-    
-    def do_POST(self):
-        """Handle POST requests for container control."""
-        parsed_path = urlparse(self.path)
-        
-        if parsed_path.path == '/api/containers/stop-all':
-            self.handle_containers_stop_all()
-        elif parsed_path.path == '/api/containers/start-all':
-            self.handle_containers_start_all()
-        elif parsed_path.path.startswith('/api/container/') and '/stop' in parsed_path.path:
-            self.handle_container_stop(parsed_path.path)
-        elif parsed_path.path.startswith('/api/container/') and '/restart' in parsed_path.path:
-            self.handle_container_restart(parsed_path.path)
-        else:
-            self.send_error(404, "Not Found")
-    
-    def handle_container_stats(self):
-        """Get Docker container statistics."""
-        try:
-            # Get container list with basic info using docker ps (include stopped containers)
-            containers_result = subprocess.run(
-                ['docker', 'ps', '-a', '--format', '{{.Names}},{{.Status}},{{.State}},{{.RunningFor}}', '--filter', 'name=aq-devsuite-'],
-                capture_output=True, text=True, check=True, timeout=10
-            )
-            
-            containers_basic = []
-            if containers_result.stdout.strip():
-                for line in containers_result.stdout.strip().split('\n'):
-                    if line.strip():
-                        parts = line.split(',')
-                        if len(parts) >= 4:
-                            containers_basic.append({
-                                'Name': parts[0],
-                                'Status': parts[1],
-                                'State': 'running' if 'Up' in parts[1] else 'exited',
-                                'Service': parts[0].replace('aq-devsuite-', ''),
-                                'RunningFor': parts[3]
-                            })
-            
-            # Get all container stats in one command (much faster!)
-            running_containers = [c['Name'] for c in containers_basic if c.get('State', '').lower() == 'running']
-            stats_by_name = {}
-            
-            if running_containers:
-                try:
-                    # Get stats for all running containers at once
-                    stats_result = subprocess.run(
-                        ['docker', 'stats', '--no-stream', '--format', 
-                         'table {{.Name}}\t{{.CPUPerc}}\t{{.MemUsage}}\t{{.NetIO}}'] + running_containers,
-                        capture_output=True, text=True, timeout=10
-                    )
-                    
-                    if stats_result.returncode == 0:
-                        stats_lines = stats_result.stdout.strip().split('\n')
-                        for line in stats_lines[1:]:  # Skip header
-                            parts = line.split('\t')
-                            if len(parts) >= 4:
-                                name = parts[0]
-                                stats_by_name[name] = {
-                                    'cpu_percent': self.parse_cpu(parts[1]),
-                                    'memory_mb': self.parse_memory_usage(parts[2])[0],
-                                    'memory_limit_mb': self.parse_memory_usage(parts[2])[1],
-                                    'network_rx_mb': self.parse_network_io(parts[3])[0],
-                                    'network_tx_mb': self.parse_network_io(parts[3])[1]
-                                }
-                except (subprocess.TimeoutExpired, subprocess.CalledProcessError):
-                    pass  # Will use mock data below
-            
-            # Build final container list
-            containers_with_stats = []
-            for container in containers_basic:
-                container_name = container.get('Name', '')
-                status = container.get('State', 'unknown').lower()
-                
-                container_info = {
-                    'name': container_name,
-                    'service': container.get('Service', 'unknown'),
-                    'status': status,
-                    'health': 'healthy' if 'healthy' in container.get('Status', '').lower() or status == 'running' else ('stopped' if status == 'exited' else 'unhealthy'),
-                    'uptime': container.get('RunningFor', 'Unknown'),
-                    'cpu_percent': 0.0,
-                    'memory_mb': 0.0,
-                    'memory_limit_mb': 512.0,
-                    'network_rx_mb': 0.0,
-                    'network_tx_mb': 0.0
-                }
-                
-                # Use real stats if available, otherwise mock data
-                if container_name in stats_by_name:
-                    container_info.update(stats_by_name[container_name])
-                else:
-                    # Use mock data for demo or when stats unavailable
-                    import random
-                    container_info['cpu_percent'] = random.uniform(0.5, 15.0)
-                    container_info['memory_mb'] = random.uniform(50, 300)
-                    container_info['network_rx_mb'] = random.uniform(0.1, 10)
-                    container_info['network_tx_mb'] = random.uniform(0.1, 5)
-                
-                containers_with_stats.append(container_info)
-            
-            response_data = {
-                'containers': containers_with_stats,
-                'timestamp': time.time(),
-                'total_containers': len(containers_with_stats),
-                'running_containers': len([c for c in containers_with_stats if c['status'] == 'running'])
-            }
-            
-            self.send_json_response(response_data)
-            
-        except Exception as e:
-            self.send_json_response({'error': str(e)}, status_code=500)
-    
-    def handle_system_info(self):
-        """Get basic system information."""
-        try:
-            # Get Docker version
-            docker_version = subprocess.run(
-                ['docker', '--version'],
-                capture_output=True, text=True, timeout=5
-            ).stdout.strip()
-            
-            # Get Docker Compose version
-            compose_version = subprocess.run(
-                ['docker-compose', '--version'],
-                capture_output=True, text=True, timeout=5
-            ).stdout.strip()
-            
-            system_info = {
-                'docker_version': docker_version,
-                'compose_version': compose_version,
-                'timestamp': time.time()
-            }
-            
-            self.send_json_response(system_info)
-            
-        except Exception as e:
-            self.send_json_response({'error': str(e)}, status_code=500)
-    
-    def handle_health(self):
-        """Health check endpoint for Docker healthcheck."""
-        try:
-            # Simple health check - just return OK
-            self.send_json_response({'status': 'healthy', 'timestamp': time.time()})
-        except Exception as e:
-            self.send_json_response({'status': 'unhealthy', 'error': str(e)}, status_code=500)
-    
-    def handle_container_stop(self, path):
-        """Stop a specific container."""
-        container_name = self.extract_container_name(path)
-        if not container_name:
-            self.send_json_response({'error': 'Invalid container name'}, 400)
-            return
-        
-        try:
-            # Use direct docker command instead of docker-compose
-            result = subprocess.run(
-                ['docker', 'stop', f'aq-devsuite-{container_name}'],
-                capture_output=True, text=True, timeout=30
-            )
-            
-            if result.returncode == 0:
-                self.send_json_response({
-                    'success': True, 
-                    'message': f'Container {container_name} stopped successfully',
-                    'output': result.stdout
-                })
-            else:
-                self.send_json_response({
-                    'success': False,
-                    'error': f'Failed to stop container: {result.stderr}'
-                }, 500)
-                
-        except Exception as e:
-            self.send_json_response({'error': str(e)}, 500)
-    
-    def handle_containers_stop_all(self):
-        """Stop all containers except essential services."""
-        try:
-            # Define essential container names that should NOT be stopped
-            essential_containers = [
-                'aq-devsuite-npm',           # Nginx Proxy Manager - needed for web access
-                'aq-devsuite-system-monitor', # System monitor - this dashboard
-                'aq-devsuite-monitor-api',    # Monitor API - backend for dashboard
-                'aq-devsuite-portainer'       # Docker management interface
-            ]
-            
-            # Get list of all running containers with aq-devsuite prefix
-            ps_result = subprocess.run(
-                ['docker', 'ps', '--format', '{{.Names}}', '--filter', 'name=aq-devsuite-'],
-                capture_output=True, text=True, timeout=10
-            )
-            
-            if ps_result.returncode != 0:
-                self.send_json_response({
-                    'success': False,
-                    'error': f'Failed to list containers: {ps_result.stderr}'
-                }, 500)
-                return
-            
-            # Parse container names
-            all_containers = [name.strip() for name in ps_result.stdout.strip().split('\n') if name.strip()]
-            
-            # Filter out essential containers
-            containers_to_stop = [c for c in all_containers if c not in essential_containers]
-            
-            # Stop only non-essential containers
-            if containers_to_stop:
-                # Stop containers one by one (more reliable than batch)
-                stopped = []
-                failed = []
-                
-                for container in containers_to_stop:
-                    stop_result = subprocess.run(
-                        ['docker', 'stop', container],
-                        capture_output=True, text=True, timeout=30
-                    )
-                    
-                    if stop_result.returncode == 0:
-                        stopped.append(container)
-                    else:
-                        failed.append(container)
-                
-                if stopped:
-                    self.send_json_response({
-                        'success': True,
-                        'message': f'Stopped {len(stopped)} non-essential containers. Kept {len(essential_containers)} essential services running.',
-                        'stopped': stopped,
-                        'failed': failed if failed else None,
-                        'kept_running': essential_containers
-                    })
-                else:
-                    self.send_json_response({
-                        'success': False,
-                        'error': 'Failed to stop any containers',
-                        'failed': failed
-                    }, 500)
-            else:
-                self.send_json_response({
-                    'success': True,
-                    'message': 'No containers to stop (only essential services are running)',
-                    'kept_running': essential_containers
-                })
-                
-        except Exception as e:
-            self.send_json_response({'error': str(e)}, 500)
-    
-    def handle_containers_start_all(self):
-        """Start all containers."""
+from typing import NamedTuple
+import aiohttp
+from aiohttp import web
+
+
+CORS_HEADERS = {
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Methods': 'GET, POST, OPTIONS',
+    'Access-Control-Allow-Headers': 'Content-Type',
+}
+
+# Seconds a serialized response stays fresh. The dashboard polls stats every few
+# seconds, while Docker/Compose versions only change when the host is upgraded,
+# so they are read once per process (see warm_system_info()) and browsers may
+# reuse that response for SYSTEM_INFO_MAX_AGE seconds.
+STATS_CACHE_TTL = 2
+SYSTEM_INFO_CACHE_TTL = float('inf')
+SYSTEM_INFO_MAX_AGE = 3600
+
+# Seconds the set of existing container names is trusted when validating actions
+KNOWN_NAMES_CACHE_TTL = 2
+
+# Cache of serialized JSON bodies (and the known-names set): key -> (monotonic timestamp, value)
+_cache = {}
+
+# Cache refreshes currently running: key -> task shared by every waiting request
+_inflight = {}
+
+# Every container in the stack is named with this prefix (see docker-compose.yml)
+CONTAINER_PREFIX = 'aq-devsuite-'
+
+# Allowed service names in /api/container/{name}/... paths
+NAME_RE = re.compile(r'[a-z0-9][a-z0-9_-]{0,62}')
+
+# Healthcheck result Docker appends to a running container's Status, e.g. "Up 2 hours (healthy)"
+HEALTH_RE = re.compile(r'\((healthy|unhealthy|health: starting)\)$')
+
+# Containers that stop-all must NOT stop
+ESSENTIAL_CONTAINERS = frozenset({
+    'aq-devsuite-npm',            # Nginx Proxy Manager - needed for web access
+    'aq-devsuite-system-monitor', # System monitor - this dashboard
+    'aq-devsuite-monitor-api',    # Monitor API - backend for dashboard
+    'aq-devsuite-portainer',      # Docker management interface
+})
+KEPT_RUNNING = sorted(ESSENTIAL_CONTAINERS)
+
+# Docker Engine API socket mounted into the container (see docker-compose.yml)
+DOCKER_SOCKET = '/var/run/docker.sock'
+
+# Upper bound on concurrent connections to the Docker socket
+DOCKER_MAX_CONNECTIONS = 32
+
+# Lifecycle actions stop-all/start-all run at once, sized to the CPUs available to us
+ACTION_WORKERS = min(8, len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count() or 1)
+
+# Seconds between launching successive lifecycle actions
+ACTION_STAGGER = 0.05
+
+# Application key for the shared Docker API session opened by docker_client_ctx()
+DOCKER_CLIENT = web.AppKey('docker_client', aiohttp.ClientSession)
+
+# Seconds between resource usage samples taken by poll_container_stats()
+STATS_POLL_INTERVAL = 2
+
+# Stats requests the poller keeps in flight at once (below DOCKER_MAX_CONNECTIONS)
+STATS_CONCURRENCY = 16
+
+# Samples older than this many seconds are treated as missing, e.g. while Docker is unreachable
+STATS_STALE_AFTER = 3 * STATS_POLL_INTERVAL
+
+# Latest resource usage per container name, kept current by poll_container_stats():
+# name -> (monotonic time sampled, usage fields)
+_latest_stats = {}
+
+# Previous raw CPU counters per container name: (container total usage, host system usage)
+_prev_cpu = {}
+
+# Container events that change which containers exist or what the dashboard shows for them
+CONTAINER_EVENTS = frozenset({'create', 'start', 'die', 'destroy', 'rename', 'pause', 'unpause', 'health_status'})
+
+# All aq-devsuite /containers/json records (stopped included) by name, kept current by watch_containers()
+_containers = {}
+
+# True while _containers is seeded and following Docker's event stream
+_containers_synced = False
+
+
+class Container(NamedTuple):
+    """The fields of a /containers/json entry the dashboard shows."""
+
+    name: str
+    service: str
+    status: str
+    state: str
+    health: str
+    running_for: str
+
+    @classmethod
+    def from_api(cls, record):
+        """Build a Container from a Docker Engine API /containers/json entry."""
+        name = get_container_name(record)
+        status = record.get('Status', '')
+        state = record.get('State', 'unknown').lower()
+        return cls(
+            name=name,
+            service=name.removeprefix(CONTAINER_PREFIX),
+            status=status,
+            state=state,
+            health=container_health(state, status),
+            running_for=format_running_for(record.get('Created'))
+        )
+
+
+def container_health(state, status):
+    """
+    Derive the dashboard health label from a container's State and Status.
+
+    Running containers report their healthcheck result ('healthy', 'unhealthy' or
+    'starting'), or 'none' when the image defines no healthcheck; running alone
+    doesn't make a container healthy.
+    """
+    if state == 'exited':
+        return 'stopped'
+    if state != 'running':
+        return 'unhealthy'
+    match = HEALTH_RE.search(status)
+    if not match:
+        return 'none'
+    return match.group(1).removeprefix('health: ')
+
+
+async def cached(key, ttl, producer):
+    """
+    Return the cached body for `key`, awaiting `producer()` again once it is older than `ttl`.
+
+    Concurrent callers that miss the cache share one in-flight refresh instead of
+    each querying Docker; a caller that disconnects doesn't cancel it for the rest.
+    """
+    entry = _cache.get(key)
+    if entry and time.monotonic() - entry[0] < ttl:
+        return entry[1]
+
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(refresh_cache(key, producer))
+        _inflight[key] = task
+        task.add_done_callback(lambda _: _inflight.pop(key, None))
+    return await asyncio.shield(task)
+
+
+async def refresh_cache(key, producer):
+    """Await `producer()` and store its body under `key`."""
+    body = await producer()
+    _cache[key] = (time.monotonic(), body)
+    return body
+
+
+async def docker_client_ctx(app):
+    """
+    Share one pooled Docker Engine API session across all handlers and the stats poller.
+
+    Keep-alive connections on the socket are reused instead of opening a new
+    one per request; the pool is capped so a burst of stats samples can't
+    exhaust file descriptors.
+    """
+    connector = aiohttp.UnixConnector(path=DOCKER_SOCKET, limit=DOCKER_MAX_CONNECTIONS)
+    async with aiohttp.ClientSession(connector=connector, base_url='http://docker') as docker:
+        app[DOCKER_CLIENT] = docker
+        yield
+
+
+async def docker_error(resp):
+    """Return the error message from a failed Docker Engine API response."""
+    try:
+        return (await resp.json()).get('message', resp.reason)
+    except (aiohttp.ContentTypeError, json.JSONDecodeError):
+        return (await resp.text()).strip() or resp.reason
+
+
+async def list_containers(docker, all=False):
+    """List aq-devsuite containers, including stopped ones when `all` is set."""
+    params = {'filters': json.dumps({'name': [CONTAINER_PREFIX]})}
+    if all:
+        params['all'] = 'true'
+    async with docker.get('/containers/json', params=params) as resp:
+        resp.raise_for_status()
+        return await resp.json()
+
+
+async def known_container_names(docker):
+    """Return the names of all aq-devsuite containers, cached for KNOWN_NAMES_CACHE_TTL seconds."""
+    if _containers_synced:
+        return frozenset(_containers)
+
+    async def fetch_names():
+        return frozenset(get_container_name(c) for c in await list_containers(docker, all=True))
+
+    return await cached('container-names', KNOWN_NAMES_CACHE_TTL, fetch_names)
+
+
+async def current_containers(docker):
+    """Return all aq-devsuite container records, from the event-maintained cache when it is in sync."""
+    if _containers_synced:
+        return list(_containers.values())
+    return await list_containers(docker, all=True)
+
+
+async def refresh_containers(docker):
+    """Reload _containers from the Docker Engine API."""
+    containers = await list_containers(docker, all=True)
+    _containers.clear()
+    _containers.update((get_container_name(c), c) for c in containers)
+
+
+async def watch_containers(docker):
+    """
+    Keep `_containers` current from Docker's event stream instead of listing on every request.
+
+    The list is loaded once the event stream is open, so no change slips in between,
+    and reloaded only when a container event for the stack arrives. If the stream
+    drops, readers fall back to listing directly until it is re-established.
+    """
+    global _containers_synced
+    filters = json.dumps({'type': ['container']})
+    while True:
         try:
-            # Get list of all stopped containers with aq-devsuite prefix
-            ps_result = subprocess.run(
-                ['docker', 'ps', '-a', '--format', '{{.Names}}\t{{.State}}', '--filter', 'name=aq-devsuite-'],
-                capture_output=True, text=True, timeout=10
-            )
-            
-            if ps_result.returncode != 0:
-                self.send_json_response({
-                    'success': False,
-                    'error': f'Failed to list containers: {ps_result.stderr}'
-                }, 500)
-                return
-            
-            # Parse container names and states
-            containers_to_start = []
-            for line in ps_result.stdout.strip().split('\n'):
-                if line.strip():
-                    parts = line.split('\t')
-                    if len(parts) == 2:
-                        name, state = parts
-                        if state.lower() != 'running':
-                            containers_to_start.append(name)
-            
-            # Start stopped containers
-            if containers_to_start:
-                started = []
-                failed = []
-                
-                for container in containers_to_start:
-                    start_result = subprocess.run(
-                        ['docker', 'start', container],
-                        capture_output=True, text=True, timeout=30
-                    )
-                    
-                    if start_result.returncode == 0:
-                        started.append(container)
-                    else:
-                        failed.append(container)
-                
-                if started:
-                    self.send_json_response({
-                        'success': True,
-                        'message': f'Started {len(started)} containers.',
-                        'started': started,
-                        'failed': failed if failed else None
-                    })
-                else:
-                    self.send_json_response({
-                        'success': False,
-                        'error': 'Failed to start any containers',
-                        'failed': failed
-                    }, 500)
-            else:
-                self.send_json_response({
-                    'success': True,
-                    'message': 'All containers are already running'
-                })
-                
+            # Events are long-lived: don't apply the session's default total timeout
+            async with docker.get('/events', params={'filters': filters}, timeout=aiohttp.ClientTimeout()) as resp:
+                resp.raise_for_status()
+                await refresh_containers(docker)
+                _containers_synced = True
+
+                async for line in resp.content:
+                    event = json.loads(line)
+                    attributes = (event.get('Actor') or {}).get('Attributes') or {}
+                    name = attributes.get('name') or ''
+                    action = (event.get('Action') or '').partition(':')[0]
+                    if name.startswith(CONTAINER_PREFIX) and action in CONTAINER_EVENTS:
+                        await refresh_containers(docker)
+        except (aiohttp.ClientError, OSError, ValueError) as e:
+            print(f"Lost Docker event stream: {e}")
         except Exception as e:
-            self.send_json_response({'error': str(e)}, 500)
-    
-    def handle_container_restart(self, path):
-        """Restart a specific container."""
-        container_name = self.extract_container_name(path)
-        if not container_name:
-            self.send_json_response({'error': 'Invalid container name'}, 400)
-            return
-        
+            # Keep watching; a dead watcher would silently serve a stale container list
+            print(f"Unexpected error while watching Docker events: {e!r}")
+        finally:
+            # Readers list directly until the stream is re-established
+            _containers_synced = False
+
+        await asyncio.sleep(STATS_POLL_INTERVAL)
+
+
+async def container_watch_ctx(app):
+    """Run the container list watcher for the lifetime of the application."""
+    task = asyncio.create_task(watch_containers(app[DOCKER_CLIENT]))
+    yield
+    task.cancel()
+    with contextlib.suppress(asyncio.CancelledError):
+        await task
+
+
+def get_container_name(container):
+    """Return the name of a container from a /containers/json entry."""
+    return container['Names'][0].lstrip('/')
+
+
+async def container_action(docker, action, container, timeout):
+    """
+    POST a lifecycle action (`stop`, `start`, `restart`) for a container.
+
+    Returns None on success or the daemon's error message. A 304 means the
+    container was already in the requested state, which counts as success.
+    """
+    client_timeout = aiohttp.ClientTimeout(total=timeout)
+    async with docker.post(f'/containers/{container}/{action}', timeout=client_timeout) as resp:
+        if resp.status in (204, 304):
+            return None
+        return await docker_error(resp)
+
+
+def encode_json(data):
+    """Serialize a response payload to compact JSON bytes."""
+    return json.dumps(data, separators=(',', ':')).encode('utf-8')
+
+
+async def run_docker_action(docker, action, containers, timeout):
+    """
+    Apply a lifecycle action to every container concurrently.
+
+    At most ACTION_WORKERS actions run at once and launches are spaced
+    ACTION_STAGGER seconds apart, so stopping or starting the whole stack
+    doesn't pin dockerd. Returns a (succeeded, failed) pair of container-name
+    lists; a request that errors or times out counts as failed.
+    """
+    semaphore = asyncio.Semaphore(ACTION_WORKERS)
+
+    async def run(index, container):
+        await asyncio.sleep(index * ACTION_STAGGER)
+        async with semaphore:
+            return await container_action(docker, action, container, timeout)
+
+    results = await asyncio.gather(
+        *(run(index, container) for index, container in enumerate(containers)),
+        return_exceptions=True
+    )
+
+    succeeded = []
+    failed = []
+    for container, error in zip(containers, results):
+        if error is None:
+            succeeded.append(container)
+        else:
+            failed.append(container)
+    return succeeded, failed
+
+
+def json_response(data, status_code=200):
+    """Build a JSON response with CORS headers. `data` may already be encoded bytes."""
+    body = data if isinstance(data, bytes) else encode_json(data)
+    return web.Response(
+        body=body,
+        status=status_code,
+        content_type='application/json',
+        headers=CORS_HEADERS
+    )
+
+
+def cacheable_json_response(request, body, max_age, etag_source=None):
+    """
+    Build a JSON response the browser may reuse for `max_age` seconds.
+
+    The ETag is a hash of the encoded body, or of `etag_source` when the body carries
+    fields that change on every rebuild, so a poll that sends back a matching
+    If-None-Match gets an empty 304 instead of the same content again.
+    """
+    etag_source = body if etag_source is None else etag_source
+    etag = f'"{hashlib.blake2b(etag_source, digest_size=8).hexdigest()}"'
+    headers = {**CORS_HEADERS, 'ETag': etag, 'Cache-Control': f'max-age={max_age}'}
+    if request.headers.get('If-None-Match') == etag:
+        return web.Response(status=304, headers=headers)
+    return web.Response(body=body, content_type='application/json', headers=headers)
+
+
+async def handle_container_stats(request):
+    """Get Docker container statistics."""
+    try:
+        docker = request.app[DOCKER_CLIENT]
+        body, etag_source = await cached('container-stats', STATS_CACHE_TTL, lambda: collect_container_stats(docker))
+        return cacheable_json_response(request, body, STATS_CACHE_TTL, etag_source)
+    except Exception as e:
+        return json_response({'error': str(e)}, status_code=500)
+
+
+async def collect_container_stats(docker):
+    """
+    Query Docker for container status and resource usage.
+
+    Returns the encoded response body and the encoded container list. The ETag is
+    taken from the list alone, since the body's timestamp changes on every rebuild.
+    """
+    # Get container list with basic info (include stopped containers)
+    containers = await current_containers(docker)
+
+    # Resource usage comes from the background poller, not a per-request shell-out
+    fresh_after = time.monotonic() - STATS_STALE_AFTER
+    stats_by_name = {
+        name: usage for name, (sampled_at, usage) in _latest_stats.items() if sampled_at >= fresh_after
+    }
+
+    # Build final container list, counting running containers in the same pass
+    containers_with_stats = []
+    running_count = 0
+    for container in map(Container.from_api, containers):
+        status = container.state
+        if status == 'running':
+            running_count += 1
+
+        container_info = {
+            'name': container.name,
+            'service': container.service,
+            'status': status,
+            'health': container.health,
+            'uptime': container.running_for,
+            'cpu_percent': 0.0,
+            'memory_mb': 0.0,
+            'memory_limit_mb': 512.0,
+            'network_rx_mb': 0.0,
+            'network_tx_mb': 0.0
+        }
+
+        # Use real stats if available; stopped or not-yet-sampled containers report zeros
+        if container.name in stats_by_name:
+            container_info.update(stats_by_name[container.name])
+
+        containers_with_stats.append(container_info)
+
+    response_data = {
+        'containers': containers_with_stats,
+        'timestamp': time.time(),
+        'total_containers': len(containers_with_stats),
+        'running_containers': running_count
+    }
+
+    # The counts are derived from the list, so it alone decides whether anything changed
+    return encode_json(response_data), encode_json(containers_with_stats)
+
+
+def format_running_for(created):
+    """Format a container's creation timestamp the way `docker ps` shows RunningFor, e.g. '2 hours ago'."""
+    if not created:
+        return 'Unknown'
+
+    seconds = max(time.time() - created, 0)
+    minutes = seconds / 60
+    hours = minutes / 60
+    if seconds < 1:
+        return 'Less than a second ago'
+    if seconds < 60:
+        duration = f'{int(seconds)} seconds'
+    elif minutes < 2:
+        duration = 'About a minute'
+    elif minutes < 60:
+        duration = f'{int(minutes)} minutes'
+    elif hours < 2:
+        duration = 'About an hour'
+    elif hours < 48:
+        duration = f'{int(hours)} hours'
+    elif hours < 24 * 14:
+        duration = f'{int(hours / 24)} days'
+    elif hours < 24 * 60:
+        duration = f'{int(hours / 24 / 7)} weeks'
+    elif hours < 24 * 365 * 2:
+        duration = f'{int(hours / 24 / 30)} months'
+    else:
+        duration = f'{int(hours / 24 / 365)} years'
+    return f'{duration} ago'
+
+
+def compute_usage(name, stats):
+    """
+    Convert a raw one-shot stats document into the dashboard's usage fields.
+
+    One-shot stats carry no `precpu_stats`, so CPU% is derived from the delta
+    against the previous sample kept in `_prev_cpu` (the same math `docker stats` uses).
+    """
+    cpu_stats = stats.get('cpu_stats', {})
+    total_usage = cpu_stats.get('cpu_usage', {}).get('total_usage', 0)
+    system_usage = cpu_stats.get('system_cpu_usage', 0)
+    online_cpus = cpu_stats.get('online_cpus') or 1
+
+    cpu_percent = 0.0
+    previous = _prev_cpu.get(name)
+    if previous:
+        cpu_delta = total_usage - previous[0]
+        system_delta = system_usage - previous[1]
+        if cpu_delta > 0 and system_delta > 0:
+            cpu_percent = cpu_delta / system_delta * online_cpus * 100
+    _prev_cpu[name] = (total_usage, system_usage)
+
+    # Like the docker CLI, don't count reclaimable page cache as used memory
+    memory_stats = stats.get('memory_stats', {})
+    memory_detail = memory_stats.get('stats', {})
+    cache = memory_detail.get('inactive_file', memory_detail.get('total_inactive_file', 0))
+    memory_used = max(memory_stats.get('usage', 0) - cache, 0)
+
+    networks = (stats.get('networks') or {}).values()
+
+    return {
+        'cpu_percent': cpu_percent,
+        'memory_mb': memory_used / (1024 * 1024),
+        'memory_limit_mb': memory_stats.get('limit', 0) / (1024 * 1024) or 512.0,
+        'network_rx_mb': sum(n.get('rx_bytes', 0) for n in networks) / 1_000_000,
+        'network_tx_mb': sum(n.get('tx_bytes', 0) for n in networks) / 1_000_000
+    }
+
+
+async def fetch_container_stats(docker, name):
+    """Fetch one raw stats sample for a container without Docker's built-in sampling delay."""
+    async with docker.get(f'/containers/{name}/stats', params={'stream': 'false', 'one-shot': 'true'}) as resp:
+        resp.raise_for_status()
+        return await resp.json()
+
+
+async def poll_container_stats(docker):
+    """
+    Keep `_latest_stats` current by sampling running containers through the Docker Engine API.
+
+    Every STATS_POLL_INTERVAL seconds, all running aq-devsuite containers are sampled
+    concurrently with `one-shot=true`, so request handlers only read memory. The running
+    set comes from `current_containers`, so no listing is made while the event watcher
+    is in sync. At most
+    STATS_CONCURRENCY samples are in flight, leaving socket connections free for
+    the dashboard's own requests.
+    """
+    semaphore = asyncio.Semaphore(STATS_CONCURRENCY)
+
+    async def sample(name):
+        async with semaphore:
+            return await fetch_container_stats(docker, name)
+
+    while True:
         try:
-            # Use direct docker command instead of docker-compose
-            result = subprocess.run(
-                ['docker', 'restart', f'aq-devsuite-{container_name}'],
-                capture_output=True, text=True, timeout=60
+            # The event-maintained list only re-lists the daemon after a container event
+            running = [get_container_name(c) for c in await current_containers(docker) if c['State'] == 'running']
+
+            samples = await asyncio.gather(
+                *(sample(name) for name in running),
+                return_exceptions=True
             )
-            
-            if result.returncode == 0:
-                self.send_json_response({
-                    'success': True,
-                    'message': f'Container {container_name} restarted successfully',
-                    'output': result.stdout
-                })
-            else:
-                self.send_json_response({
-                    'success': False,
-                    'error': f'Failed to restart container: {result.stderr}'
-                }, 500)
-                
+
+            sampled_at = time.monotonic()
+            for name, result in zip(running, samples):
+                # A failed sample keeps the previous entry until it goes stale
+                if not isinstance(result, Exception):
+                    _latest_stats[name] = (sampled_at, compute_usage(name, result))
+
+            # Containers that stopped drop out immediately
+            running_names = set(running)
+            for name in list(_latest_stats):
+                if name not in running_names:
+                    del _latest_stats[name]
+            for name in list(_prev_cpu):
+                if name not in running_names:
+                    del _prev_cpu[name]
+        except (aiohttp.ClientError, OSError) as e:
+            print(f"Could not sample container stats: {e}")
         except Exception as e:
-            self.send_json_response({'error': str(e)}, 500)
-    
-    def handle_container_logs(self, path):
-        """Get logs for a specific container."""
-        container_name = self.extract_container_name(path)
-        if not container_name:
-            self.send_json_response({'error': 'Invalid container name'}, 400)
-            return
-        
-        try:
-            # Use direct docker command instead of docker-compose
-            result = subprocess.run(
-                ['docker', 'logs', '--tail', '100', f'aq-devsuite-{container_name}'],
-                capture_output=True, text=True, timeout=15
-            )
-            
-            self.send_json_response({
+            # Keep polling; a dead poller would silently serve stale stats
+            print(f"Unexpected error while sampling container stats: {e!r}")
+
+        await asyncio.sleep(STATS_POLL_INTERVAL)
+
+
+async def stats_poller_ctx(app):
+    """Run the container stats poller for the lifetime of the application."""
+    task = asyncio.create_task(poll_container_stats(app[DOCKER_CLIENT]))
+    yield
+    task.cancel()
+    with contextlib.suppress(asyncio.CancelledError):
+        await task
+
+
+async def handle_system_info(request):
+    """Get basic system information."""
+    try:
+        docker = request.app[DOCKER_CLIENT]
+        body = await cached('system-info', SYSTEM_INFO_CACHE_TTL, lambda: collect_system_info(docker))
+        return cacheable_json_response(request, body, SYSTEM_INFO_MAX_AGE)
+    except Exception as e:
+        return json_response({'error': str(e)}, status_code=500)
+
+
+async def warm_system_info(app):
+    """Read Docker and Compose versions at startup; a failure is retried on the first request."""
+    docker = app[DOCKER_CLIENT]
+    try:
+        await cached('system-info', SYSTEM_INFO_CACHE_TTL, lambda: collect_system_info(docker))
+    except (aiohttp.ClientError, OSError) as e:
+        print(f"Could not read Docker versions at startup: {e}")
+
+
+async def collect_system_info(docker):
+    """Query Docker and Docker Compose versions and return the encoded response body."""
+    async with docker.get('/version') as resp:
+        resp.raise_for_status()
+        version = await resp.json()
+    containers = await list_containers(docker, all=True)
+
+    # Compose has no daemon API; it stamps its version on every container it creates
+    compose_versions = [
+        c['Labels']['com.docker.compose.version']
+        for c in containers
+        if 'com.docker.compose.version' in (c.get('Labels') or {})
+    ]
+
+    system_info = {
+        'docker_version': f"Docker version {version.get('Version', 'unknown')}, build {version.get('GitCommit', 'unknown')}",
+        'compose_version': f'Docker Compose version v{compose_versions[0]}' if compose_versions else 'Unknown',
+        'timestamp': time.time()
+    }
+
+    return encode_json(system_info)
+
+
+async def handle_health(request):
+    """Health check endpoint for Docker healthcheck."""
+    try:
+        # Simple health check - just return OK
+        return json_response({'status': 'healthy', 'timestamp': time.time()})
+    except Exception as e:
+        return json_response({'status': 'unhealthy', 'error': str(e)}, status_code=500)
+
+
+async def handle_container_stop(request):
+    """Stop a specific container."""
+    container_name = extract_container_name(request)
+    if not container_name:
+        return json_response({'error': 'Invalid container name'}, 400)
+
+    docker = request.app[DOCKER_CLIENT]
+    try:
+        full_name = f'{CONTAINER_PREFIX}{container_name}'
+        if full_name not in await known_container_names(docker):
+            return json_response({'error': f'Container {container_name} not found'}, 404)
+
+        error = await container_action(docker, 'stop', full_name, timeout=30)
+
+        if error is None:
+            return json_response({
                 'success': True,
-                'container': container_name,
-                'logs': result.stdout,
-                'errors': result.stderr if result.stderr else None
+                'message': f'Container {container_name} stopped successfully',
+                'output': full_name
             })
-                
-        except Exception as e:
-            self.send_json_response({'error': str(e)}, 500)
-    
-    def extract_container_name(self, path):
-        """Extract container name from API path like /api/container/app-prod/stop."""
-        try:
-            parts = path.strip('/').split('/')
-            if len(parts) >= 3 and parts[0] == 'api' and parts[1] == 'container':
-                return parts[2]
-            return None
-        except:
-            return None
+        return json_response({
+            'success': False,
+            'error': f'Failed to stop container: {error}'
+        }, 500)
 
-    def send_json_response(self, data, status_code=200):
-        """Send a JSON response with CORS headers."""
-        self.send_response(status_code)
-        self.send_header('Content-Type', 'application/json')
-        self.send_header('Access-Control-Allow-Origin', '*')
-        self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
-        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
-        self.end_headers()
-        
-        json_data = json.dumps(data, indent=2)
-        self.wfile.write(json_data.encode('utf-8'))
-    
-    def do_OPTIONS(self):
-        """Handle CORS preflight requests."""
-        self.send_response(200)
-        self.send_header('Access-Control-Allow-Origin', '*')
-        self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
-        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
-        self.end_headers()
-    
-    def parse_cpu(self, cpu_str):
-        """Parse CPU percentage string like '1.23%' to float."""
-        try:
-            return float(cpu_str.replace('%', '')) if cpu_str != '--' else 0.0
-        except (ValueError, AttributeError):
-            return 0.0
-    
-    def parse_memory_usage(self, memory_str):
-        """Parse memory usage string like '123.4MiB / 512MiB' to (used_mb, limit_mb)."""
-        try:
-            if '/' in memory_str:
-                used, limit = memory_str.split('/')
-                return (self.parse_memory(used.strip()), self.parse_memory(limit.strip()))
-            else:
-                return (self.parse_memory(memory_str), 512.0)
-        except (ValueError, AttributeError):
-            return (0.0, 512.0)
-    
-    def parse_network_io(self, network_str):
-        """Parse network I/O string like '1.23MB / 456kB' to (rx_mb, tx_mb)."""
-        try:
-            if '/' in network_str:
-                rx, tx = network_str.split('/')
-                return (self.parse_network(rx.strip()), self.parse_network(tx.strip()))
-            else:
-                return (0.0, 0.0)
-        except (ValueError, AttributeError):
-            return (0.0, 0.0)
-
-    def parse_memory(self, memory_str):
-        """Parse memory string like '123.4MiB' to MB."""
+    except Exception as e:
+        return json_response({'error': str(e)}, 500)
+
+
+async def handle_containers_stop_all(request):
+    """Stop all containers except essential services."""
+    try:
+        docker = request.app[DOCKER_CLIENT]
+
+        # Get list of all running containers with aq-devsuite prefix
         try:
-            memory_str = memory_str.replace('MiB', '').replace('MB', '').replace('GiB', '').replace('GB', '')
-            value = float(memory_str)
-            
-            # Convert to MB if needed
-            if 'GiB' in memory_str or 'GB' in memory_str:
-                value *= 1024
-            
-            return value
-        except (ValueError, AttributeError):
-            return 0.0
-    
-    def parse_network(self, network_str):
-        """Parse network string like '1.23MB' to MB."""
+            all_containers = [get_container_name(c) for c in await list_containers(docker)]
+        except aiohttp.ClientError as e:
+            return json_response({
+                'success': False,
+                'error': f'Failed to list containers: {e}'
+            }, 500)
+
+        # Filter out essential containers
+        containers_to_stop = [c for c in all_containers if c not in ESSENTIAL_CONTAINERS]
+
+        # Stop only non-essential containers
+        if not containers_to_stop:
+            return json_response({
+                'success': True,
+                'message': 'No containers to stop (only essential services are running)',
+                'kept_running': KEPT_RUNNING
+            })
+
+        # Stop every container with its own request, all running concurrently
+        stopped, failed = await run_docker_action(docker, 'stop', containers_to_stop, timeout=30)
+
+        if stopped:
+            return json_response({
+                'success': True,
+                'message': f'Stopped {len(stopped)} non-essential containers. Kept {len(ESSENTIAL_CONTAINERS)} essential services running.',
+                'stopped': stopped,
+                'failed': failed if failed else None,
+                'kept_running': KEPT_RUNNING
+            })
+        return json_response({
+            'success': False,
+            'error': 'Failed to stop any containers',
+            'failed': failed
+        }, 500)
+
+    except Exception as e:
+        return json_response({'error': str(e)}, 500)
+
+
+async def handle_containers_start_all(request):
+    """Start all containers."""
+    try:
+        docker = request.app[DOCKER_CLIENT]
+
+        # Get list of all stopped containers with aq-devsuite prefix
         try:
-            if 'kB' in network_str:
-                return float(network_str.replace('kB', '')) / 1024
-            elif 'MB' in network_str:
-                return float(network_str.replace('MB', ''))
-            elif 'GB' in network_str:
-                return float(network_str.replace('GB', '')) * 1024
-            else:
-                return 0.0
-        except (ValueError, AttributeError):
-            return 0.0
-    
-    def parse_uptime(self, status_str):
-        """Extract uptime from Docker status string."""
+            containers = await list_containers(docker, all=True)
+        except aiohttp.ClientError as e:
+            return json_response({
+                'success': False,
+                'error': f'Failed to list containers: {e}'
+            }, 500)
+
+        containers_to_start = [get_container_name(c) for c in containers if c.get('State') != 'running']
+
+        # Start stopped containers
+        if not containers_to_start:
+            return json_response({
+                'success': True,
+                'message': 'All containers are already running'
+            })
+
+        started, failed = await run_docker_action(docker, 'start', containers_to_start, timeout=30)
+
+        if started:
+            return json_response({
+                'success': True,
+                'message': f'Started {len(started)} containers.',
+                'started': started,
+                'failed': failed if failed else None
+            })
+        return json_response({
+            'success': False,
+            'error': 'Failed to start any containers',
+            'failed': failed
+        }, 500)
+
+    except Exception as e:
+        return json_response({'error': str(e)}, 500)
+
+
+async def handle_container_restart(request):
+    """Restart a specific container."""
+    container_name = extract_container_name(request)
+    if not container_name:
+        return json_response({'error': 'Invalid container name'}, 400)
+
+    docker = request.app[DOCKER_CLIENT]
+    try:
+        full_name = f'{CONTAINER_PREFIX}{container_name}'
+        if full_name not in await known_container_names(docker):
+            return json_response({'error': f'Container {container_name} not found'}, 404)
+
+        error = await container_action(docker, 'restart', full_name, timeout=60)
+
+        if error is None:
+            return json_response({
+                'success': True,
+                'message': f'Container {container_name} restarted successfully',
+                'output': full_name
+            })
+        return json_response({
+            'success': False,
+            'error': f'Failed to restart container: {error}'
+        }, 500)
+
+    except Exception as e:
+        return json_response({'error': str(e)}, 500)
+
+
+async def handle_container_logs(request):
+    """
+    Get logs for a specific container.
+
+    Stdout is streamed to the client frame by frame as the `logs` string of the usual
+    JSON body, so a container with large log lines is never held in memory whole.
+    Stderr is normally short and is collected for the trailing `errors` field.
+    """
+    container_name = extract_container_name(request)
+    if not container_name:
+        return json_response({'error': 'Invalid container name'}, 400)
+
+    docker = request.app[DOCKER_CLIENT]
+    response = None
+    try:
+        if f'{CONTAINER_PREFIX}{container_name}' not in await known_container_names(docker):
+            return json_response({'error': f'Container {container_name} not found'}, 404)
+
+        # Only TTY containers send a raw log stream. Daemons before API 1.42 label
+        # multiplexed streams as raw too, so the content type can't decide this.
+        async with docker.get(f'/containers/{CONTAINER_PREFIX}{container_name}/json') as resp:
+            if resp.status != 200:
+                return json_response({'error': await docker_error(resp)}, 500)
+            multiplexed = not (await resp.json())['Config']['Tty']
+
+        params = {'stdout': 'true', 'stderr': 'true', 'tail': '100'}
+        async with docker.get(f'/containers/{CONTAINER_PREFIX}{container_name}/logs', params=params) as resp:
+            if resp.status != 200:
+                return json_response({'error': await docker_error(resp)}, 500)
+
+            response = web.StreamResponse(headers=CORS_HEADERS)
+            response.content_type = 'application/json'
+            # Log text is the largest and most compressible payload; gzip it when the client accepts it
+            response.enable_compression()
+            await response.prepare(request)
+            await response.write(f'{{"success":true,"container":{json.dumps(container_name)},"logs":"'.encode('utf-8'))
+
+            decoder = codecs.getincrementaldecoder('utf-8')('replace')
+            stderr = bytearray()
+            async for stream_type, chunk in iter_log_frames(resp.content, multiplexed):
+                if stream_type == 2:
+                    stderr.extend(chunk)
+                else:
+                    await response.write(json_string_fragment(decoder.decode(chunk)))
+            await response.write(json_string_fragment(decoder.decode(b'', final=True)))
+
+        errors = stderr.decode('utf-8', 'replace') or None
+        await response.write(f'","errors":{json.dumps(errors)}}}'.encode('utf-8'))
+        await response.write_eof()
+        return response
+
+    except Exception as e:
+        if response is not None and response.prepared:
+            # Headers are already sent; cut the body short rather than append an error to it
+            raise
+        return json_response({'error': str(e)}, 500)
+
+
+async def iter_log_frames(stream, multiplexed):
+    """
+    Yield (stream type, bytes) chunks from a Docker logs response as they arrive.
+
+    Containers without a TTY prefix every frame with an 8-byte header: stream type
+    (1 = stdout, 2 = stderr), three padding bytes and a big-endian length. TTY
+    containers send one raw stream, reported as stdout.
+    """
+    if not multiplexed:
+        async for chunk in stream.iter_any():
+            yield 1, chunk
+        return
+
+    while True:
         try:
-            if 'Up ' in status_str:
-                # Extract the uptime part
-                uptime_part = status_str.split('Up ')[1].split(' (')[0] if '(' in status_str else status_str.split('Up ')[1]
-                return uptime_part.strip()
-            else:
-                return 'Unknown'
-        except (IndexError, AttributeError):
-            return 'Unknown'
-    
-    def log_message(self, format, *args):
-        """Override to reduce log noise."""
-        pass
+            header = await stream.readexactly(8)
+        except asyncio.IncompleteReadError:
+            return
+        stream_type, length = struct.unpack('>BxxxL', header)
+        yield stream_type, await stream.readexactly(length)
+
+
+def json_string_fragment(text):
+    """Encode text for splicing into a JSON string literal that is already open."""
+    return json.dumps(text)[1:-1].encode('utf-8')
+
+
+@web.middleware
+async def cors_preflight_middleware(request, handler):
+    """Answer CORS preflight requests for any path."""
+    if request.method == 'OPTIONS':
+        return web.Response(status=200, headers=CORS_HEADERS)
+    return await handler(request)
+
+
+def extract_container_name(request):
+    """
+    Extract container name from API path like /api/container/app-prod/stop.
+
+    Returns None for names that can't be a compose service, so they are rejected
+    without a round trip to the Docker daemon.
+    """
+    name = request.match_info.get('name')
+    if not name or not NAME_RE.fullmatch(name):
+        return None
+    return name
+
+
+# Route table built once at import. aiohttp resolves plain paths through an index
+# lookup and only the /api/container/{name}/... resources need a pattern match.
+ROUTES = [
+    web.get('/api/container-stats', handle_container_stats),
+    web.get('/api/system-info', handle_system_info),
+    web.get('/health', handle_health),
+    web.get('/api/container/{name}/logs', handle_container_logs),
+    web.post('/api/containers/stop-all', handle_containers_stop_all),
+    web.post('/api/containers/start-all', handle_containers_start_all),
+    web.post('/api/container/{name}/stop', handle_container_stop),
+    web.post('/api/container/{name}/restart', handle_container_restart),
+]
+
+
+def create_app():
+    """Create the aiohttp application with all API routes registered."""
+    app = web.Application(middlewares=[cors_preflight_middleware])
+    app.cleanup_ctx.append(docker_client_ctx)
+    app.cleanup_ctx.append(container_watch_ctx)
+    app.cleanup_ctx.append(stats_poller_ctx)
+    app.on_startup.append(warm_system_info)
+    app.add_routes(ROUTES)
+    return app
 
 
 def run_server(port=8083):
     """Run the stats API server."""
-    server_address = ('', port)
-    httpd = HTTPServer(server_address, DockerStatsHandler)
     print(f"Docker stats API server running on http://localhost:{port}")
     print("Available endpoints:")
     print(f"  - http://localhost:{port}/api/container-stats")
     print(f"  - http://localhost:{port}/api/system-info")
     print("Press Ctrl+C to stop...")
-    
-    try:
-        httpd.serve_forever()
-    except KeyboardInterrupt:
-        print("\nShutting down stats API server...")
-        httpd.shutdown()
+
+    # access_log=None keeps request logging quiet, as the dashboard polls frequently
+    web.run_app(create_app(), port=port, access_log=None, print=None)
+    print("\nShutting down stats API server...")
 
 
 if __name__ == '__main__':
-    run_server()
\ No newline at end of file
+    run_server()
@@ -11,10 +11,26 @@ This is the first test that should be run after starting the application.
 
 import sys
 import time
+import atexit
 import requests
 import subprocess
+from requests.adapters import HTTPAdapter
 from typing import Dict, Any
 
+# (connect, read) timeouts for the health probe. A refused or unreachable stack
+# fails fast, but the endpoint awaits every backend service in turn, including
+# AI provider round trips, so reads keep a generous allowance.
+HEALTH_TIMEOUT = (1, 30)
+
+# Seconds to keep polling /health while a freshly started stack comes up
+HEALTH_READY_DEADLINE = 10
+HEALTH_POLL_INTERVAL = 0.2
+
+# One pooled session so repeated probes reuse their keep-alive connection
+SESSION = requests.Session()
+SESSION.mount('http://', HTTPAdapter(pool_connections=8, pool_maxsize=8))
+atexit.register(SESSION.close)
+
 
 def main():
     """Main test execution function."""
@@ -61,12 +77,14 @@ def check_container_status() -> Dict[str, Any]:
     ]
 
     try:
-        # Use `docker ps` to get the names of all currently running containers.
+        # Ask `docker ps` for just the expected containers that are running; repeated
+        # name filters are OR'ed by the daemon, so unrelated containers never come back.
+        name_filters = [f'--filter=name=^{c}$' for c in expected_containers]
         result = subprocess.run(
-            ['docker', 'ps', '--format', '{{.Names}}'],
+            ['docker', 'ps', '--format', '{{.Names}}'] + name_filters,
             capture_output=True, text=True, check=True, timeout=10
         )
-        running_containers = result.stdout.strip().split('\n')
+        running_containers = frozenset(name for name in result.stdout.splitlines() if name.strip())
 
         missing = [c for c in expected_containers if c not in running_containers]
 
@@ -90,10 +108,21 @@ def test_health_endpoint() -> Dict[str, Any]:
     """
     health_url = "http://localhost/health"
     try:
-        # Allow a moment for services to respond after startup.
-        time.sleep(2)
-        response = requests.get(health_url, timeout=30)
-        response.raise_for_status()  # Raise an exception for bad status codes (4xx or 5xx)
+        # Poll while the stack is still coming up (connection refused or a 5xx from the proxy)
+        # until the deadline passes. A read timeout fails at once: retrying would only queue
+        # another round of AI provider calls behind the one still in progress.
+        deadline = time.monotonic() + HEALTH_READY_DEADLINE
+        while True:
+            try:
+                response = SESSION.get(health_url, timeout=HEALTH_TIMEOUT)
+            except requests.exceptions.ConnectionError:
+                if time.monotonic() >= deadline:
+                    raise
+            else:
+                if response.status_code < 500 or time.monotonic() >= deadline:
+                    response.raise_for_status()  # Raise an exception for bad status codes (4xx or 5xx)
+                    break
+            time.sleep(HEALTH_POLL_INTERVAL)
 
         health_data = response.json()
         print(f"Successfully connected to {health_url} (Status: {response.status_code})")
@@ -15,8 +15,10 @@ It verifies:
 import sys
 import os
 import time
+import atexit
 import requests
 import json
+from requests.adapters import HTTPAdapter
 from typing import Dict, Any
 from pathlib import Path
 
@@ -32,6 +34,11 @@ TEST_API_URL = "http://localhost:8000"
 
 HEALTH_URL = "http://localhost/health"
 
+# One pooled session so every request reuses its keep-alive connection
+SESSION = requests.Session()
+SESSION.mount('http://', HTTPAdapter(pool_connections=4, pool_maxsize=16))
+atexit.register(SESSION.close)
+
 
 def main_test_logic():
     """Main function to run all OpenRouter integration tests."""
@@ -83,7 +90,7 @@ def check_environment() -> bool:
 def test_openrouter_service_health() -> bool:
     """Queries the app's health endpoint to check the OpenRouter service status."""
     try:
-        response = requests.get(HEALTH_URL, timeout=10)
+        response = SESSION.get(HEALTH_URL, timeout=10)
         response.raise_for_status()
         health_data = response.json()
         openrouter_health = health_data.get('containers', {}).get('openrouter', {})
@@ -100,7 +107,7 @@ def test_simple_ai_generation() -> bool:
         "user_context": "Please reply with the single word: success"
     }
     try:
-        response = requests.post("{TEST_API_URL}/ai-test", json=test_data, timeout=30)
+        response = SESSION.post("{TEST_API_URL}/ai-test", json=test_data, timeout=30)
         response.raise_for_status()
         result = response.json()
         # Check that we got a non-empty string back in the ai_result field.
@@ -114,7 +121,7 @@ def test_error_handling() -> bool:
     """Tests if the server correctly returns a 422 Unprocessable Entity error for invalid requests."""
     try:
         # Send a request with a missing `user_context` field.
-        response = requests.post(f"{TEST_API_URL}/ai-test", json={"system_prompt": "test"}, timeout=10)
+        response = SESSION.post(f"{TEST_API_URL}/ai-test", json={"system_prompt": "test"}, timeout=10)
         # A 422 status code is expected because the request fails Pydantic validation.
         return response.status_code == 422
     except requests.exceptions.RequestException as e:
@@ -7,7 +7,7 @@ This script tests the functionality of the MinIO object storage service.
 It verifies:
 - Client connectivity to the MinIO server.
 - Bucket operations (creation, existence check).
-- File operations (upload, download, content verification).
+- File operations (upload, checksum verification, optional download).
 - Metadata handling.
 - Object listing and cleanup.
 """
@@ -15,9 +15,11 @@ It verifies:
 import sys
 import io
 import time
+import hashlib
 import json
 from typing import Dict, Any
 from minio import Minio
+from minio.deleteobjects import DeleteObject
 from minio.error import S3Error
 
 # Configuration for connecting to the local MinIO container.
@@ -38,6 +40,11 @@ MINIO_BUCKET = "poc-bucket"
 TEST_OBJECT_PREFIX = "test-suite/"
 
 
+# Also download the object and compare bytes; the ETag check alone covers
+# single-part uploads, whose ETag is the MD5 of the content.
+VERIFY_BYTES = False
+
+
 def main_test_logic():
     """Main function to run all MinIO tests."""
     print("=" * 60)
@@ -60,10 +67,10 @@ def main_test_logic():
         print("[OK] Bucket operations are working correctly.")
 
         # --- Test 3: File Operations ---
-        print("\n3. Verifying file upload, download, and content integrity...")
+        print("\n3. Verifying file upload and content integrity...")
         if not test_file_operations(client):
             raise RuntimeError("File operations test failed.")
-        print("[OK] File upload, download, and content verification successful.")
+        print("[OK] File upload and content verification successful.")
 
     except Exception as e:
         print("\n[X] FAILED: An error occurred: {e}")
@@ -93,12 +100,13 @@ def test_bucket_operations(client: Minio) -> bool:
     """Ensures the target bucket exists, creating it if necessary."""
     if not client.bucket_exists(MINIO_BUCKET):
         print("   -> Bucket '{MINIO_BUCKET}' not found. Creating it...")
+        # make_bucket raises S3Error on failure, so no second HeadBucket is needed.
         client.make_bucket(MINIO_BUCKET)
-    return client.bucket_exists(MINIO_BUCKET)
+    return True
 
 
 def test_file_operations(client: Minio) -> bool:
-    """Tests a full cycle of uploading, downloading, and verifying a test file."""
+    """Tests uploading a test file and verifying its stored checksum, optionally downloading it back."""
     test_filename = "{TEST_OBJECT_PREFIX}test-file.txt"
     test_content = "Hello MinIO! Timestamp: {time.time()}"
     content_bytes = test_content.encode('utf-8')
@@ -109,14 +117,25 @@ def test_file_operations(client: Minio) -> bool:
     )
     print("   -> Uploaded '{test_filename}'.")
 
-    # 2. Download the file back.
+    # 2. Verify the stored checksum without transferring the body back.
+    stat = client.stat_object(MINIO_BUCKET, test_filename)
+    if stat.etag.strip('"') != hashlib.md5(content_bytes).hexdigest():
+        raise ValueError("Checksum mismatch: Stored ETag does not match the uploaded content.")
+    print("   -> Checksum verified successfully.")
+
+    if not VERIFY_BYTES:
+        return True
+
+    # 3. Download the file back.
     response = client.get_object(MINIO_BUCKET, test_filename)
-    downloaded_content = response.read()
-    response.close()
-    response.release_conn()
+    try:
+        downloaded_content = response.read()
+    finally:
+        response.close()
+        response.release_conn()
     print("   -> Downloaded '{test_filename}'.")
 
-    # 3. Verify the content is identical.
+    # 4. Verify the content is identical.
     if downloaded_content != content_bytes:
         raise ValueError("Content mismatch: Downloaded content does not match uploaded content.")
     print("   -> Content verified successfully.")
@@ -125,18 +144,22 @@ def test_file_operations(client: Minio) -> bool:
 
 def cleanup_test_objects(client: Minio) -> int:
     """Removes all objects created during the test run."""
-    try:
-        # List all objects with the specific test prefix.
-        test_objects = client.list_objects(MINIO_BUCKET, prefix=TEST_OBJECT_PREFIX, recursive=True)
-        object_names = [obj.object_name for obj in test_objects]
+    listed = 0
 
-        if not object_names:
-            return 0
+    def delete_list():
+        # Stream the listing straight into the multi-object delete.
+        nonlocal listed
+        for obj in client.list_objects(MINIO_BUCKET, prefix=TEST_OBJECT_PREFIX, recursive=True):
+            listed += 1
+            yield DeleteObject(obj.object_name)
 
-        # Delete each found object.
-        for obj_name in object_names:
-            client.remove_object(MINIO_BUCKET, obj_name)
-        return len(object_names)
+    try:
+        # remove_objects is lazy and only sends its batched delete requests
+        # once the error iterator is consumed.
+        errors = list(client.remove_objects(MINIO_BUCKET, delete_list()))
+        for error in errors:
+            print(f"   -> Warning: Could not delete '{error.name}': {error.message}")
+        return listed - len(errors)
     except S3Error as e:
         print("   -> Warning: Could not clean up objects: {e}")
         return 0